@@ -1,44 +1,156 @@
 import hou
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from datetime import datetime, timedelta
 import os
-import glob
-import imageio
-import numpy as np
-from PIL import Image
 import json
+import html
+import re
+import tempfile
+import time
 import traceback
+import collections
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from PySide2 import QtWidgets, QtCore
 
+try:
+    # Opcional: permite subir los previews en streaming sin cargarlos en memoria
+    from requests_toolbelt import MultipartEncoder
+except ImportError:
+    MultipartEncoder = None
+
 CONFIG_FILE = os.path.join(hou.getenv("HOUDINI_USER_PREF_DIR"), "telegram_config.json")
 NOTIFICATIONS_ENABLED = False
 SESSION_RENDERS = {}
 CURRENT_RENDERS = {}
-CALLBACK_REGISTRY = set()
+# Ruta del nodo -> (nodo, callback de render registrado)
+CALLBACK_REGISTRY = {}
 SHELF_TOOL_CREATED = False
 
-def load_config():
-    """Load or create the Telegram configuration file."""
-    if os.path.exists(CONFIG_FILE):
-        with open(CONFIG_FILE, "r") as f:
-            config = json.load(f)
-    else:
+# Una sesión HTTP por hilo (requests.Session no es thread-safe); cada una
+# reutiliza sus conexiones TLS con api.telegram.org
+_THREAD_LOCAL = threading.local()
+
+def get_session():
+    session = getattr(_THREAD_LOCAL, "session", None)
+    if session is None:
+        session = requests.Session()
+        session.mount("https://", HTTPAdapter(
+            pool_connections=4,
+            pool_maxsize=16,
+            # Solo se reintentan los errores de conexión: urllib3 no repite POST por código
+            # de estado, y los 429 se gestionan en telegram_post
+            max_retries=Retry(total=2, backoff_factor=0.3)
+        ))
+        _THREAD_LOCAL.session = session
+    return session
+
+# Pool para enviar a varios chats en paralelo
+_HTTP_POOL = ThreadPoolExecutor(max_workers=4)
+
+# (mtime, datos) del archivo de configuración. Se sustituye entera en una sola
+# asignación para que ningún hilo vea el mtime nuevo con los datos viejos.
+_CONFIG_CACHE = (None, None)
+
+# Formato de los tokens de BotFather (<id del bot>:<clave de 35 caracteres>) y de
+# los chat IDs (numéricos, negativos en grupos, o @usuario de un canal)
+_TOKEN_RE = re.compile(r"^\d+:[A-Za-z0-9_-]{35}$")
+_CHAT_ID_RE = re.compile(r"^(-?\d+|@\w{5,})$")
+# Cada chat ID es un bloque sin comas ni espacios
+_CHAT_ID_TOKEN_RE = re.compile(r"[^\s,]+")
+
+def parse_chat_ids(text):
+    """Splits the comma/space separated CHAT_ID input in a single regex pass, dropping empty entries."""
+    return _CHAT_ID_TOKEN_RE.findall(text)
+
+def load_config(prompt=False):
+    """
+    Load the Telegram configuration file.
+    The parsed file is cached and only re-read when its mtime changes.
+    If the file is missing it is created by asking the user when `prompt` is set
+    (only at script startup, on the main thread); otherwise FileNotFoundError is raised.
+    """
+    if not os.path.exists(CONFIG_FILE):
+        if not prompt:
+            # Los envíos llegan desde hilos en segundo plano: ahí no se puede abrir un diálogo
+            raise FileNotFoundError(f"Telegram config not found: {CONFIG_FILE}")
         bot_token = hou.ui.readInput("Enter your Telegram BOT_TOKEN")[1]
         chat_id = hou.ui.readInput("Enter your Telegram CHAT_ID (separate multiple IDs with commas)")[1]
-        chat_ids = [cid.strip() for cid in chat_id.split(",")]
+        chat_ids = parse_chat_ids(chat_id)
         config = {
             "BOT_TOKEN": bot_token,
             "CHAT_IDS": chat_ids
         }
-        with open(CONFIG_FILE, "w") as f:
-            json.dump(config, f)
+        save_config(config)
         print(f"Configuración guardada en: {CONFIG_FILE}")
         ask_to_create_shelf_tool()
+
+    global _CONFIG_CACHE
+    st = os.stat(CONFIG_FILE)
+    cached_mtime, cached_config = _CONFIG_CACHE
+    if st.st_mtime == cached_mtime:
+        return cached_config
+    with open(CONFIG_FILE, "r") as f:
+        config = json.load(f)
+    _CONFIG_CACHE = (st.st_mtime, config)
     return config
 
-config = load_config()
-BOT_TOKEN = config["BOT_TOKEN"]
-CHAT_ID = config.get("CHAT_IDS", config.get("CHAT_ID"))
+def save_config(config):
+    """
+    Writes `config` to CONFIG_FILE atomically (temp file + os.replace).
+    Returns False without touching the file if the contents are unchanged.
+    The config cache is refreshed directly, without relying on the file's mtime.
+    """
+    global _CONFIG_CACHE
+    new_contents = json.dumps(config, separators=(",", ":"))
+    try:
+        with open(CONFIG_FILE, "r") as f:
+            unchanged = f.read() == new_contents
+    except OSError:
+        unchanged = False
+    if not unchanged:
+        temp_file = CONFIG_FILE + ".tmp"
+        with open(temp_file, "w") as f:
+            f.write(new_contents)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_file, CONFIG_FILE)
+    # Dos guardados dentro de la resolución del mtime dejarían la caché con los datos viejos
+    _CONFIG_CACHE = (os.stat(CONFIG_FILE).st_mtime, json.loads(new_contents))
+    return not unchanged
+
+def get_config():
+    """Devuelve la configuración actual (cargada de forma perezosa)."""
+    return load_config()
+
+def get_bot_token():
+    return get_config()["BOT_TOKEN"]
+
+def get_chat_ids():
+    """Returns the configured chat IDs as a list (old configs store a single CHAT_ID)."""
+    config = get_config()
+    chat_ids = config.get("CHAT_IDS", config.get("CHAT_ID"))
+    if isinstance(chat_ids, list):
+        return chat_ids
+    return [chat_ids]
+
+_API_URLS = {"token": None}
+
+def get_api_url(method):
+    """Returns the Bot API URL for `method`, rebuilt only when the token changes."""
+    global _API_URLS
+    token = get_bot_token()
+    urls = _API_URLS
+    if urls["token"] != token:
+        # Se construye un dict nuevo y se sustituye de una vez: otros hilos pueden estar leyendo el anterior
+        urls = {name: f"https://api.telegram.org/bot{token}/{name}"
+                for name in ("sendMessage", "editMessageText", "sendPhoto", "sendAnimation")}
+        urls["token"] = token
+        _API_URLS = urls
+    return urls[method]
 
 
 def get_shelves_path():
@@ -193,78 +305,372 @@ telegram_notifications.create_ui()
         print(f"Error in ask_to_create_shelf_tool: {str(e)}")
         traceback.print_exc()
 
+# Las 11 barras posibles (0% a 100%) se generan una sola vez
+_PROGRESS_BARS = ["🟩" * filled + "⬜" * (10 - filled) for filled in range(11)]
+
 def get_progress_bar(progress):
-    bar_length = 10
-    filled = int(round(bar_length * progress))
-    return "🟩" * filled + "⬜" * (bar_length - filled)
-
-def send_telegram_message(message):
-    if isinstance(CHAT_ID, list):
-        for chat_id in CHAT_ID:
-            url = f"https://api.telegram.org/bot{BOT_TOKEN}/sendMessage"
-            data = {
-                "chat_id": chat_id,
-                "text": message,
-                "parse_mode": "HTML"
-            }
-            try:
-                response = requests.post(url, data=data)
-                if response.ok:
-                    return response.json()["result"]["message_id"]
-            except Exception as e:
-                ui.log_message(f"Error sending message to chat {chat_id}: {str(e)}")
-    else:
-        url = f"https://api.telegram.org/bot{BOT_TOKEN}/sendMessage"
-        data = {
-            "chat_id": CHAT_ID,
-            "text": message,
-            "parse_mode": "HTML"
-        }
+    filled = int(round(10 * progress))
+    return _PROGRESS_BARS[max(0, min(10, filled))]
+
+class RateLimiter:
+    """Token bucket shared by every Bot API request (Telegram allows ~30 msg/s per bot)."""
+
+    def __init__(self, rate=25, per=1.0):
+        self.rate = rate
+        self.per = per
+        self._tokens = float(rate)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.rate, self._tokens + (now - self._last) * self.rate / self.per)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) * self.per / self.rate
+            time.sleep(wait)
+
+RATE_LIMITER = RateLimiter()
+# No bloquear más de esto esperando un Retry-After de Telegram
+MAX_RETRY_AFTER = 30
+# (conexión, lectura) en segundos; las subidas de previews necesitan más margen
+REQUEST_TIMEOUT = (3, 10)
+UPLOAD_TIMEOUT = (3, 60)
+
+def get_retry_after(response):
+    """Seconds Telegram asks us to wait after an HTTP 429."""
+    try:
+        return float(response.json().get("parameters", {}).get("retry_after", 1))
+    except ValueError:
+        return float(response.headers.get("Retry-After", 1))
+
+def telegram_post(url, data, file_field=None, file_path=None):
+    """
+    POSTs to the Bot API through the shared session and rate limiter.
+    On HTTP 429 waits for the requested Retry-After and tries once more.
+    """
+    session = get_session()
+    for attempt in range(2):
+        RATE_LIMITER.acquire()
+        if file_path and MultipartEncoder is not None:
+            with open(file_path, 'rb') as f:
+                fields = {key: str(value) for key, value in data.items()}
+                fields[file_field] = (os.path.basename(file_path), f)
+                encoder = MultipartEncoder(fields=fields)
+                response = session.post(url, data=encoder, headers={'Content-Type': encoder.content_type},
+                                        timeout=UPLOAD_TIMEOUT)
+        elif file_path:
+            with open(file_path, 'rb') as f:
+                response = session.post(url, data=data, files={file_field: f}, timeout=UPLOAD_TIMEOUT)
+        else:
+            response = session.post(url, json=data, timeout=REQUEST_TIMEOUT)
+        if response.status_code != 429 or attempt:
+            return response
+        retry_after = get_retry_after(response)
+        if retry_after > MAX_RETRY_AFTER:
+            return response
+        time.sleep(retry_after)
+
+def post_to_chats(url, payloads, file_field=None, file_path=None):
+    """
+    Sends one POST per chat in parallel.
+    `payloads` maps chat_id -> form data; returns chat_id -> (response, error).
+    """
+    def post(chat_id):
         try:
-            response = requests.post(url, data=data)
-            if response.ok:
-                return response.json()["result"]["message_id"]
+            return telegram_post(url, payloads[chat_id], file_field, file_path), None
         except Exception as e:
-            ui.log_message(f"Error sending message: {str(e)}")
-    return None
+            return None, e
+    chat_ids = list(payloads)
+    return dict(zip(chat_ids, _HTTP_POOL.map(post, chat_ids)))
 
-def convert_frame_to_rgb(frame_path):
+def get_uploaded_file_id(response, file_field):
+    """Extracts the file_id Telegram assigned to an uploaded photo/animation, or None."""
     try:
-        with Image.open(frame_path) as img:
-            if img.mode != 'RGB':
-                img = img.convert('RGB')
-            return np.array(img)
-    except Exception as e:
-        ui.log_message(f"Error converting frame {frame_path}: {str(e)}")
+        result = response.json()["result"]
+        if file_field == 'photo':
+            # La última entrada es la de mayor resolución
+            return result['photo'][-1]['file_id']
+        media = result.get(file_field) or result.get('document')
+        return media['file_id'] if media else None
+    except (ValueError, KeyError, IndexError, TypeError):
         return None
 
-def resize_frame(frame, max_size=(800, 800)):
-    img = Image.fromarray(frame)
-    w, h = img.size
-    if h > max_size[1] or w > max_size[0]:
-        ratio = min(max_size[0] / w, max_size[1] / h)
-        new_size = (int(w * ratio), int(h * ratio))
-        img = img.resize(new_size, Image.ANTIALIAS)
-    return np.array(img)
+def send_media_to_chats(method, file_field, file_path, caption):
+    """
+    Uploads `file_path` once to the first chat and reuses the returned file_id
+    for the remaining chats. Returns chat_id -> (response, error).
+    """
+    chat_ids = get_chat_ids()
+    url = get_api_url(method)
+    first_chat = chat_ids[0]
+    results = post_to_chats(url, {first_chat: {"chat_id": first_chat, "caption": caption}}, file_field, file_path)
+    other_payloads = {chat_id: {"chat_id": chat_id, "caption": caption} for chat_id in chat_ids[1:]}
+    if not other_payloads:
+        return results
+    response, error = results[first_chat]
+    file_id = get_uploaded_file_id(response, file_field) if error is None and response.ok else None
+    if file_id:
+        for payload in other_payloads.values():
+            payload[file_field] = file_id
+        results.update(post_to_chats(url, other_payloads))
+    else:
+        # Sin file_id no hay más remedio que subir el archivo a cada chat
+        results.update(post_to_chats(url, other_payloads, file_field, file_path))
+    return results
+
+def send_telegram_message(message, chat_ids=None):
+    """
+    Sends `message` to `chat_ids` (every configured chat by default).
+    Returns a dict chat_id -> message_id for the chats that accepted it.
+    """
+    if chat_ids is None:
+        chat_ids = get_chat_ids()
+    payloads = {
+        chat_id: {"chat_id": chat_id, "text": message, "parse_mode": "HTML"}
+        for chat_id in chat_ids
+    }
+    message_ids = {}
+    for chat_id, (response, error) in post_to_chats(get_api_url("sendMessage"), payloads).items():
+        if error is not None:
+            ui.log_message(f"Error sending message to chat {chat_id}: {str(error)}")
+        elif response.ok:
+            message_ids[chat_id] = response.json()["result"]["message_id"]
+        else:
+            ui.log_message(f"Telegram rejected message for chat {chat_id}: {response.text}")
+    return message_ids
+
+# Mensajes de los callbacks de render pendientes de enviar. Se agrupan y se
+# envían juntos cada FLUSH_INTERVAL_MS desde un QTimer de la UI. Sin límite de
+# tamaño: si el event loop está bloqueado (render en primer plano) no se pierde ninguno.
+NOTIF_BUFFER = collections.deque()
+FLUSH_INTERVAL_MS = 3000
+# Telegram admite 4096 caracteres por mensaje; se deja algo de margen
+TELEGRAM_MAX_CHARS = 4000
+
+def queue_notification(message):
+    """Buffers `message` to be sent with the next batch flush."""
+    NOTIF_BUFFER.append(message)
+
+def _safe_cut(line, cut):
+    """Moves `cut` back so it does not fall inside an HTML entity (&lt;) or tag (</pre>)."""
+    for opener, closer in (("&", ";"), ("<", ">")):
+        # Las entidades y etiquetas que se generan tienen menos de 10 caracteres
+        pos = line.rfind(opener, max(0, cut - 10), cut)
+        if pos > 0 and closer not in line[pos:cut]:
+            cut = pos
+    return cut
+
+def split_line(line, size):
+    """Cuts a line longer than `size` into pieces without breaking entities or tags."""
+    pieces = []
+    while len(line) > size:
+        cut = _safe_cut(line, size)
+        pieces.append(line[:cut])
+        line = line[cut:]
+    pieces.append(line)
+    return pieces
+
+def split_message(text, limit=TELEGRAM_MAX_CHARS):
+    """
+    Splits `text` into chunks of at most `limit` characters, cutting at line
+    breaks. A <pre> block that gets cut is closed and reopened so every chunk
+    is still valid HTML for Telegram.
+    """
+    piece_size = limit - len("<pre></pre>")
+    chunks = []
+    current = ""
+    in_pre = False
+    for line in text.split("\n"):
+        # Las líneas más largas que el límite se cortan por caracteres
+        for piece in split_line(line, piece_size):
+            if current and len(current) + 1 + len(piece) + len("</pre>") > limit:
+                chunks.append(current + ("</pre>" if in_pre else ""))
+                current = ("<pre>" if in_pre else "") + piece
+            else:
+                current = f"{current}\n{piece}" if current else piece
+            if "<pre>" in piece or "</pre>" in piece:
+                in_pre = piece.rfind("<pre>") > piece.rfind("</pre>")
+    if current:
+        chunks.append(current)
+    return chunks
+
+def group_messages(messages, limit=TELEGRAM_MAX_CHARS):
+    """Groups consecutive messages so each group, joined by blank lines, fits in `limit` characters."""
+    groups = []
+    current = []
+    size = 0
+    for message in messages:
+        extra = len(message) + (2 if current else 0)
+        if current and size + extra > limit:
+            groups.append(current)
+            current = []
+            extra = len(message)
+            size = 0
+        current.append(message)
+        size += extra
+    if current:
+        groups.append(current)
+    return groups
+
+def send_long_message(text, chat_ids):
+    """Sends `text` split into Telegram-sized chunks. Returns the chats where any chunk failed."""
+    failed = set()
+    for chunk in split_message(text):
+        failed.update(cid for cid in chat_ids if cid not in send_telegram_message(chunk, chat_ids))
+    return [cid for cid in chat_ids if cid in failed]
+
+def flush_notifications():
+    """Sends every buffered notification, joined into as few messages as possible."""
+    messages = []
+    while NOTIF_BUFFER:
+        messages.append(NOTIF_BUFFER.popleft())
+    if not messages:
+        return
+    chat_ids = get_chat_ids()
+    for group in group_messages(messages):
+        failed = send_long_message("\n\n".join(group), chat_ids)
+        if not failed or len(group) == 1:
+            continue
+        # Un mensaje inválido no debe hacer perder el resto del lote: se reenvían por separado
+        ui.log_message(f"Batched notification failed for chats {', '.join(map(str, failed))}; resending {len(group)} messages one by one")
+        for message in group:
+            send_long_message(message, failed)
+
+def edit_telegram_message(message_ids, message):
+    """
+    Edits the message previously sent to each chat in `message_ids`.
+    Returns False if any of the requests raised.
+    """
+    payloads = {
+        chat_id: {"chat_id": chat_id, "message_id": message_id, "text": message, "parse_mode": "HTML"}
+        for chat_id, message_id in message_ids.items()
+    }
+    success = True
+    for chat_id, (response, error) in post_to_chats(get_api_url("editMessageText"), payloads).items():
+        if error is not None:
+            ui.log_message(f"Error editing message in chat {chat_id}: {str(error)}")
+            success = False
+    return success
+
+# Las ediciones de progreso se envían desde un hilo en segundo plano para no
+# bloquear el callback de render. Solo importa la última, así que la cola es corta.
+_EDIT_QUEUE = queue.Queue(maxsize=4)
+_EDIT_LOCK = threading.Lock()
+
+def _edit_worker():
+    while True:
+        state, message = _EDIT_QUEUE.get()
+        try:
+            with _EDIT_LOCK:
+                # No sobrescribir el mensaje final si el render ya terminó
+                if state['finished']:
+                    continue
+            # La petición va fuera del lock para no bloquear el PostRender
+            edit_telegram_message(state['message_ids'], message)
+            with _EDIT_LOCK:
+                final_message = state['final_message']
+            # Si el mensaje final se envió mientras esta edición estaba en curso, se repite para que quede el último
+            if final_message is not None:
+                edit_telegram_message(state['message_ids'], final_message)
+        except Exception as e:
+            ui.log_message(f"Error sending progress update: {str(e)}")
+
+_EDIT_THREAD = threading.Thread(target=_edit_worker, name="telegram_edit_worker", daemon=True)
+_EDIT_THREAD.start()
+
+def queue_progress_edit(state, message):
+    """Queues a progress edit without blocking; when full, the oldest pending edit is dropped."""
+    item = (state, message)
+    try:
+        _EDIT_QUEUE.put_nowait(item)
+    except queue.Full:
+        try:
+            _EDIT_QUEUE.get_nowait()
+        except queue.Empty:
+            pass
+        try:
+            _EDIT_QUEUE.put_nowait(item)
+        except queue.Full:
+            pass
+
+def finish_render_state(state):
+    """Marks a render as finished so pending progress edits are discarded."""
+    with _EDIT_LOCK:
+        state['finished'] = True
+
+def edit_final_message(state, message):
+    """
+    Edits the render's message with its final text. If a progress edit is
+    still in flight, the edit worker sends `message` again once it lands.
+    """
+    with _EDIT_LOCK:
+        state['final_message'] = message
+    return edit_telegram_message(state['message_ids'], message)
+
+# PIL y numpy solo se usan para los previews: se importan la primera vez
+_PREVIEW_LIBS = {}
+
+def get_preview_libs():
+    """Returns (Image, np), importing them on first use."""
+    if not _PREVIEW_LIBS:
+        import numpy as np
+        from PIL import Image
+        _PREVIEW_LIBS.update(
+            Image=Image,
+            np=np,
+            # BILINEAR basta para previews de 800px; Image.Resampling solo existe en Pillow >= 9.1
+            resample=getattr(Image, 'Resampling', Image).BILINEAR
+        )
+    return _PREVIEW_LIBS["Image"], _PREVIEW_LIBS["np"]
+
+def load_preview(frame_path, max_size=(800, 800)):
+    """
+    Opens a frame as an RGB PIL image scaled down to fit within `max_size`.
+    Stays in PIL the whole way; draft() lets JPEG decode straight to a smaller size.
+    """
+    Image = get_preview_libs()[0]
+    with Image.open(frame_path) as img:
+        img.draft("RGB", max_size)
+        preview = img.convert("RGB")
+    preview.thumbnail(max_size, _PREVIEW_LIBS["resample"])
+    return preview
+
+def iter_previews(frames, prefetch=3):
+    """
+    Decodes frames with load_preview() in a thread pool, yielding
+    (frame_path, preview, error) in the original order. At most `prefetch`
+    decoded frames are kept waiting ahead of the consumer.
+    """
+    def decode(frame_path):
+        try:
+            return load_preview(frame_path), None
+        except Exception as e:
+            return None, e
+
+    max_workers = max(1, min(8, os.cpu_count() or 1, len(frames)))
+    pending = collections.deque()
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        for frame_path in frames:
+            pending.append((frame_path, pool.submit(decode, frame_path)))
+            if len(pending) > max_workers + prefetch:
+                path, future = pending.popleft()
+                yield (path,) + future.result()
+        while pending:
+            path, future = pending.popleft()
+            yield (path,) + future.result()
 
 def should_update_progress(state):
-    now = datetime.now()
-    time_since_update = (now - state['last_update_time']).total_seconds()
-    if time_since_update >= state['update_interval']:
-        state['last_update_time'] = now
+    now = time.monotonic()
+    if now - state['last_update_ts'] >= state['update_interval']:
+        state['last_update_ts'] = now
         return True
     return False
 
-def clear_duplicates():
-    for node in hou.node('/').allSubChildren():
-        if is_render_node(node):
-            callbacks = node.eventCallbacks()
-            unique_callbacks = list(set(callbacks))
-            if len(callbacks) != len(unique_callbacks):
-                node.removeAllEventCallbacks()
-                for callback in unique_callbacks:
-                    node.addEventCallback((callback,))
-
 def format_time(seconds):
     hours = int(seconds // 3600)
     minutes = int((seconds % 3600) // 60)
@@ -275,95 +681,108 @@ def format_time(seconds):
         return f"{minutes}m {secs}s"
     return f"{secs}s"
 
-def send_telegram_animation(node, frames_path_pattern):
+def list_frames(output_dir, prefix, suffix):
+    """Returns the sorted paths in `output_dir` whose names look like `<prefix>*<suffix>`."""
+    min_length = len(prefix) + len(suffix)
+    with os.scandir(output_dir) as it:
+        return sorted(
+            entry.path for entry in it
+            if len(entry.name) >= min_length and entry.name.startswith(prefix) and entry.name.endswith(suffix)
+        )
+
+def make_temp_path(suffix):
+    """Creates an empty file in the system temp folder and returns its path."""
+    with tempfile.NamedTemporaryFile(prefix="telegram_preview_", suffix=suffix, delete=False) as tf:
+        return tf.name
+
+def send_telegram_animation(node, frames):
+    temp_path = None
     try:
-        frames = sorted(glob.glob(frames_path_pattern))
         if not frames:
-            ui.log_message(f"No frames found matching pattern: {frames_path_pattern}")
+            ui.log_message("No frames found for the preview")
             return False
+        np = get_preview_libs()[1]
 
         if len(frames) == 1:
             frame_path = frames[0]
             ui.log_message(f"Processing single frame: {frame_path}")
-            frame_rgb = convert_frame_to_rgb(frame_path)
-            if frame_rgb is None:
-                ui.log_message(f"Failed to convert frame {frame_path} to RGB")
+            try:
+                preview = load_preview(frame_path)
+            except Exception as e:
+                ui.log_message(f"Failed to convert frame {frame_path} to RGB: {str(e)}")
                 return False
-            frame_resized = resize_frame(frame_rgb)
-            temp_png = "temp_render_preview.png"
-            Image.fromarray(frame_resized).save(temp_png)
+            temp_path = make_temp_path(".png")
+            preview.save(temp_path)
+            preview.close()
             ui.log_message("Sending single frame to Telegram...")
-            url = f"https://api.telegram.org/bot{BOT_TOKEN}/sendPhoto"
-            with open(temp_png, 'rb') as photo:
-                files = {'photo': photo}
-                data = {
-                    "chat_id": CHAT_ID,
-                    "caption": f"🎬 Single frame preview for {get_node_name(node)}"
-                }
-                response = requests.post(url, data=data, files=files)
-                if not response.ok:
-                    ui.log_message(f"Failed to send single frame: {response.text}")
-                    return False
-            os.remove(temp_png)
-            return True
+            caption = f"🎬 Single frame preview for {get_node_name(node)}"
+            results = send_media_to_chats("sendPhoto", 'photo', temp_path, caption)
+            sent = True
+            for chat_id, (response, error) in results.items():
+                if error is not None or not response.ok:
+                    ui.log_message(f"Failed to send single frame to chat {chat_id}: {error or response.text}")
+                    sent = False
+            return sent
         else:
-            temp_gif = "temp_render_preview.gif"
-            if len(frames) > 30:
-                sample_indices = list(range(0, 10))
-                middle_frames = list(range(10, len(frames)-10, (len(frames)-20)//10))
-                sample_indices.extend(middle_frames)
-                sample_indices.extend(list(range(len(frames)-10, len(frames))))
-                frames = [frames[i] for i in sorted(set(sample_indices))]
+            frame_count = len(frames)
+            if frame_count > 30:
+                # Se toman 30 frames espaciados uniformemente (incluye el primero y el último)
+                idx = np.unique(np.linspace(0, frame_count - 1, 30).astype(np.int64))
+                frames = [frames[i] for i in idx]
             ui.log_message(f"Processing {len(frames)} frames for preview...")
+            # Como máximo 30 previews de 800px en memoria
             images = []
-            for frame_path in frames:
-                try:
-                    frame_rgb = convert_frame_to_rgb(frame_path)
-                    if frame_rgb is None:
+            try:
+                for frame_path, preview, error in iter_previews(frames):
+                    if error is not None:
+                        ui.log_message(f"Error processing frame {frame_path}: {str(error)}")
                         continue
-                    frame_resized = resize_frame(frame_rgb)
-                    images.append(Image.fromarray(frame_resized))
-                except Exception as e:
-                    ui.log_message(f"Error processing frame {frame_path}: {str(e)}")
-                    continue
-            if images:
+                    images.append(preview)
+                if not images:
+                    ui.log_message("No frames were successfully processed")
+                    return False
                 ui.log_message("Creating GIF...")
-                first_image = images[0]
-                first_image.save(
-                    temp_gif,
+                temp_path = make_temp_path(".gif")
+                images[0].save(
+                    temp_path,
                     save_all=True,
                     append_images=images[1:],
                     optimize=False,
                     duration=100,
                     loop=0
                 )
-                ui.log_message("Sending animation to Telegram...")
-                url = f"https://api.telegram.org/bot{BOT_TOKEN}/sendAnimation"
-                with open(temp_gif, 'rb') as animation:
-                    files = {'animation': animation}
-                    data = {
-                        "chat_id": CHAT_ID,
-                        "caption": f"🎬 Animation preview for {get_node_name(node)}"
-                    }
-                    response = requests.post(url, data=data, files=files)
-                    if not response.ok:
-                        ui.log_message(f"Failed to send animation: {response.text}")
-                os.remove(temp_gif)
-                for img in images:
-                    img.close()
-                return True
-            else:
-                ui.log_message("No frames were successfully processed")
-                return False
+            finally:
+                for image in images:
+                    image.close()
+            ui.log_message("Sending animation to Telegram...")
+            caption = f"🎬 Animation preview for {get_node_name(node)}"
+            results = send_media_to_chats("sendAnimation", 'animation', temp_path, caption)
+            for chat_id, (response, error) in results.items():
+                if error is not None or not response.ok:
+                    ui.log_message(f"Failed to send animation to chat {chat_id}: {error or response.text}")
+            return True
     except Exception as e:
         ui.log_message(f"Error creating/sending animation: {str(e)}")
-        if os.path.exists(temp_gif):
-            os.remove(temp_gif)
         return False
+    finally:
+        if temp_path and os.path.exists(temp_path):
+            os.remove(temp_path)
+
+_RENDER_TYPES = frozenset({'ifd', 'usdrender_rop'})
+# Nombre del tipo de cada nodo, por sessionId (el tipo de un nodo nunca cambia)
+_TYPE_CACHE = {}
+
+def get_node_type_name(node):
+    session_id = node.sessionId()
+    type_name = _TYPE_CACHE.get(session_id)
+    if type_name is None:
+        type_name = node.type().name()
+        _TYPE_CACHE[session_id] = type_name
+    return type_name
 
 def get_render_engine(node):
     try:
-        type_name = node.type().name()
+        type_name = get_node_type_name(node)
         if type_name == 'ifd':
             return "Mantra"
         if type_name == 'usdrender_rop':
@@ -392,11 +811,23 @@ def get_sequence_range(node):
 
 def is_render_node(node):
     try:
-        type_name = node.type().name()
-        return type_name in ['ifd', 'usdrender_rop']
+        return get_node_type_name(node) in _RENDER_TYPES
     except:
         return False
 
+def get_render_nodes():
+    """Returns the render nodes in the scene."""
+    return [node for node in hou.node('/').allSubChildren() if is_render_node(node)]
+
+def _clear_type_cache(event_type):
+    # Al cambiar de escena se vacía la caché de tipos para que no crezca indefinidamente
+    if event_type in (hou.hipFileEventType.AfterLoad,
+                      hou.hipFileEventType.AfterClear,
+                      hou.hipFileEventType.AfterMerge):
+        _TYPE_CACHE.clear()
+
+hou.hipFile.addEventCallback(_clear_type_cache)
+
 def update_render_stats(node_path, render_time, frame_count=1):
     if node_path not in SESSION_RENDERS:
         SESSION_RENDERS[node_path] = {
@@ -427,18 +858,42 @@ def get_render_stats(node_path):
         'last_render': format_time(stats['times'][-1]) if stats['times'] else "N/A"
     }
 
+def get_output_parm(node):
+    """Returns the parm holding the rendered image path, or None if it can't be found."""
+    try:
+        type_name = get_node_type_name(node)
+        if type_name == 'ifd':
+            return node.parm('vm_picture')
+        if type_name == 'usdrender_rop':
+            # En Karma la ruta está en el nodo referenciado por el ROP
+            ref_node = None
+            for ref in node.references():
+                if ref != node:
+                    ref_node = ref
+            if ref_node is not None:
+                return ref_node.parm('picture')
+    except:
+        pass
+    return None
+
 def initialize_render_state(node):
     start, end = get_sequence_range(node)
     frame_count = int(end - start + 1)
     return {
-        'start_time': datetime.now(),
-        'message_id': None,
-        'completed_frames': set(),
+        'start_ts': time.monotonic(),
+        'engine': get_render_engine(node),
+        'node_name': get_node_name(node),
+        'output_parm': get_output_parm(node),
+        'message_ids': {},
+        'frames_done': 0,
+        'last_frame': None,
         'total_frames': frame_count,
         'start_frame': int(start),
         'end_frame': int(end),
-        'last_update_time': datetime.now(),
-        'update_interval': 2.0
+        'last_update_ts': time.monotonic(),
+        'update_interval': 2.0,
+        'finished': False,
+        'final_message': None
     }
 
 def on_render_event(node, event_type, frame_time):
@@ -454,24 +909,25 @@ def on_render_event(node, event_type, frame_time):
             state = CURRENT_RENDERS[node_path]
             message = (
                 f"🎬 Render Started!\n"
-                f"🎨 Engine: {get_render_engine(node)}\n"
-                f"📁 Node: {get_node_name(node)}\n"
+                f"🎨 Engine: {state['engine']}\n"
+                f"📁 Node: {state['node_name']}\n"
                 f"🎯 Frames: {state['start_frame']} to {state['end_frame']} ({state['total_frames']} frames)\n"
                 f"⏱️ Frame Progress: 0/{state['total_frames']} (0%)"
             )
-            msg_id = send_telegram_message(message)
-            if msg_id:
-                CURRENT_RENDERS[node_path]['message_id'] = msg_id
+            state['message_ids'] = send_telegram_message(message)
         elif event_type == hou.ropRenderEventType.PostFrame:
             if node_path not in CURRENT_RENDERS:
                 return
             state = CURRENT_RENDERS[node_path]
-            state['completed_frames'].add(float(frame_time))
+            state['frames_done'] += 1
+            state['last_frame'] = float(frame_time)
             if should_update_progress(state):
-                duration = (datetime.now() - state['start_time']).total_seconds()
-                frames_done = len(state['completed_frames'])
+                duration = time.monotonic() - state['start_ts']
+                frames_done = state['frames_done']
                 total_frames = state['total_frames']
                 avg_time_per_frame = duration / frames_done if frames_done > 0 else 0
+                # Una actualización cada ~5 frames, nunca más de una cada 2s ni menos de una cada 30s
+                state['update_interval'] = max(2.0, min(30.0, 5 * avg_time_per_frame))
                 estimated_total = avg_time_per_frame * total_frames
                 time_remaining = max(0, estimated_total - duration)
                 progress_percent = (frames_done / total_frames) * 100
@@ -480,8 +936,8 @@ def on_render_event(node, event_type, frame_time):
                 progress_bar = get_progress_bar(frames_done / total_frames)
                 message = (
                     f"🎬 Render In Progress\n"
-                    f"🎨 Engine: {get_render_engine(node)}\n"
-                    f"📁 Node: {get_node_name(node)}\n"
+                    f"🎨 Engine: {state['engine']}\n"
+                    f"📁 Node: {state['node_name']}\n"
                     f"🎯 Progress: {frames_done}/{total_frames} frames ({progress_percent:.1f}%)\n"
                     f"📊 {progress_bar}\n"
                     f"⏱️ Time elapsed: {format_time(duration)}\n"
@@ -489,108 +945,77 @@ def on_render_event(node, event_type, frame_time):
                     f"🏁 Estimated completion: {formatted_completion_time}\n"
                     f"🔄 Average per frame: {format_time(avg_time_per_frame)}"
                 )
-                if state['message_id']:
-                    url = f"https://api.telegram.org/bot{BOT_TOKEN}/editMessageText"
-                    data = {
-                        "chat_id": CHAT_ID,
-                        "message_id": state['message_id'],
-                        "text": message,
-                        "parse_mode": "HTML"
-                    }
-                    try:
-                        requests.post(url, data=data)
-                    except Exception as e:
-                        ui.log_message(f"Error updating frame progress: {str(e)}")
+                if state['message_ids']:
+                    queue_progress_edit(state, message)
         elif event_type == hou.ropRenderEventType.PostRender:
             if node_path not in CURRENT_RENDERS:
                 return
             state = CURRENT_RENDERS[node_path]
-            render_duration = (datetime.now() - state['start_time']).total_seconds()
-            frames_completed = len(state['completed_frames'])
+            finish_render_state(state)
+            render_duration = time.monotonic() - state['start_ts']
+            frames_completed = state['frames_done']
             expected_frames = state['total_frames']
             if 0 < frames_completed < expected_frames:
                 error_message = (
                     f"⏹️ Render Interrupted!\n"
-                    f"🎨 Engine: {get_render_engine(node)}\n"
-                    f"📁 Node: {get_node_name(node)}\n"
+                    f"🎨 Engine: {state['engine']}\n"
+                    f"📁 Node: {state['node_name']}\n"
                     f"🎯 Progress when stopped: {frames_completed}/{expected_frames} frames\n"
                     f"📊 Completion: {(frames_completed/expected_frames*100):.1f}%\n"
                     f"⏱️ Time elapsed: {format_time(render_duration)}\n"
-                    f"⚡ Last frame completed: {max(state['completed_frames']) if state['completed_frames'] else 'None'}\n"
+                    f"⚡ Last frame completed: {state['last_frame']}\n"
                     f"📄 **Possible Causes:**\n"
                     f"- The render was manually interrupted.\n"
                     f"- There was an error in the render node."
                 )
-                if state['message_id']:
-                    url = f"https://api.telegram.org/bot{BOT_TOKEN}/editMessageText"
-                    data = {
-                        "chat_id": CHAT_ID,
-                        "message_id": state['message_id'],
-                        "text": error_message,
-                        "parse_mode": "HTML"
-                    }
-                    try:
-                        requests.post(url, data=data)
-                    except:
-                        send_telegram_message(error_message)
+                if state['message_ids']:
+                    if not edit_final_message(state, error_message):
+                        queue_notification(error_message)
             elif frames_completed == expected_frames:
                 update_render_stats(node_path, render_duration, frames_completed)
                 stats = get_render_stats(node_path)
                 try:
-                    if node.type().name() == 'ifd':
-                        output_path = node.parm('vm_picture').eval()
-                    elif node.type().name() == 'usdrender_rop':
-                        referenced_nodes_rop = node.references()
-                        for ref in referenced_nodes_rop:
-                            if ref != node:
-                                refNode = ref
-                        output_path = refNode.parm('picture').eval()
+                    if state['output_parm'] is None:
+                        raise ValueError("output image parameter not found")
+                    output_path = state['output_parm'].eval()
                     output_dir = os.path.dirname(output_path)
                     file_base = os.path.basename(output_path)
                     name_parts = os.path.splitext(file_base)
-                    base_pattern = os.path.join(output_dir, f"{name_parts[0].rsplit('.', 1)[0]}.*{name_parts[1]}")
-                    ui.log_message(f"Searching for frames with pattern: {base_pattern}")
-                    animation_sent = send_telegram_animation(node, base_pattern)
+                    prefix = name_parts[0].rsplit('.', 1)[0] + '.'
+                    ui.log_message(f"Searching for frames: {os.path.join(output_dir, prefix + '*' + name_parts[1])}")
+                    frames = list_frames(output_dir, prefix, name_parts[1])
+                    animation_sent = send_telegram_animation(node, frames)
                     if animation_sent:
                         ui.log_message("Animation preview sent successfully!")
                 except Exception as e:
                     ui.log_message(f"Could not generate animation preview: {str(e)}")
                 message = (
                     f"✅ Render Complete!\n"
-                    f"🎨 Engine: {get_render_engine(node)}\n"
-                    f"📁 Node: {get_node_name(node)}\n"
+                    f"🎨 Engine: {state['engine']}\n"
+                    f"📁 Node: {state['node_name']}\n"
                     f"🎯 Frames: {state['start_frame']} to {state['end_frame']} ({frames_completed} frames)\n"
                     f"⏱️ Total Duration: {format_time(render_duration)}\n\n"
                     f"📊 Statistics:\n"
                     f"Average time per frame: {stats['average']}\n"
                     f"Total frames rendered: {stats['total_renders']}"
                 )
-                if state['message_id']:
-                    url = f"https://api.telegram.org/bot{BOT_TOKEN}/editMessageText"
-                    data = {
-                        "chat_id": CHAT_ID,
-                        "message_id": state['message_id'],
-                        "text": message,
-                        "parse_mode": "HTML"
-                    }
-                    try:
-                        requests.post(url, data=data)
-                    except:
-                        send_telegram_message(message)
+                if state['message_ids']:
+                    if not edit_final_message(state, message):
+                        queue_notification(message)
                 else:
-                    send_telegram_message(message)
+                    queue_notification(message)
                 completion_message = (
                     f"🔔 RENDER FINISHED!\n\n"
-                    f"📁 {get_node_name(node)} is done rendering\n"
+                    f"📁 {state['node_name']} is done rendering\n"
                     f"⏱️ Total time: {format_time(render_duration)}\n"
                     f"🎯 Frames completed: {frames_completed}/{state['total_frames']}"
                 )
-                send_telegram_message(completion_message)
+                queue_notification(completion_message)
             else:
                 error_message = (
                     f"❌ RENDER FAILED!\n"
-                    f"🎨 Engine: {get_render_engine(node)}\n"
-                    f"📁 Node: {get_node_name(node)}\n"
+                    f"🎨 Engine: {state['engine']}\n"
+                    f"📁 Node: {state['node_name']}\n"
                     f"⚠️ No frames were completed\n"
                     f"⏱️ Time elapsed: {format_time(render_duration)}\n"
                     f"📄 **Possible Causes:**\n"
@@ -598,20 +1023,11 @@ def on_render_event(node, event_type, frame_time):
                     f"- There was an error in the render node.\n"
                     f"- The script failed to detect completed frames."
                 )
-                if state['message_id']:
-                    url = f"https://api.telegram.org/bot{BOT_TOKEN}/editMessageText"
-                    data = {
-                        "chat_id": CHAT_ID,
-                        "message_id": state['message_id'],
-                        "text": error_message,
-                        "parse_mode": "HTML"
-                    }
-                    try:
-                        requests.post(url, data=data)
-                    except:
-                        send_telegram_message(error_message)
+                if state['message_ids']:
+                    if not edit_final_message(state, error_message):
+                        queue_notification(error_message)
                 else:
-                    send_telegram_message(error_message)
+                    queue_notification(error_message)
             del CURRENT_RENDERS[node_path]
     except Exception as e:
         error_message = (
@@ -619,39 +1035,74 @@ def on_render_event(node, event_type, frame_time):
             f"📁 Node: {get_node_name(node)}\n"
             f"⚠️ Error Type: {type(e).__name__}\n"
             f"📄 **Error Message:**\n"
-            f"<pre>{str(e)}</pre>\n"
+            f"<pre>{html.escape(str(e))}</pre>\n"
             f"📄 **Traceback:**\n"
-            f"<pre>{traceback.format_exc()}</pre>\n"
+            f"<pre>{html.escape(traceback.format_exc())}</pre>\n"
             f"📄 **Possible Causes:**\n"
             f"- The render was manually interrupted.\n"
             f"- There was an error in the render node.\n"
             f"- The script failed to detect completed frames."
         )
-        send_telegram_message(error_message)
+        queue_notification(error_message)
         if node.path() in CURRENT_RENDERS:
+            finish_render_state(CURRENT_RENDERS[node.path()])
             del CURRENT_RENDERS[node.path()]
 
+def register_callback(node):
+    node_path = node.path()
+    remove_stale_callbacks(node)
+    node.addRenderEventCallback(on_render_event)
+    CALLBACK_REGISTRY[node_path] = (node, on_render_event)
+
+def unregister_callback(node_path):
+    node, callback = CALLBACK_REGISTRY.pop(node_path)
+    try:
+        node.removeRenderEventCallback(callback)
+    except hou.ObjectWasDeleted:
+        pass
+    except Exception as e:
+        ui.log_message(f"Error removing callbacks from {node_path}: {str(e)}")
+
 def remove_all_callbacks():
-    global CALLBACK_REGISTRY
-    for node in hou.node('/').allSubChildren():
-        if is_render_node(node):
-            try:
-                node.removeAllEventCallbacks()
-            except Exception as e:
-                ui.log_message(f"Error removing callbacks from {node.path()}: {str(e)}")
-    CALLBACK_REGISTRY.clear()
+    for node_path in list(CALLBACK_REGISTRY):
+        unregister_callback(node_path)
     ui.update_callbacks_list()
 
-def setup_render_callbacks():
-    global CALLBACK_REGISTRY
-    remove_all_callbacks()
-    for node in hou.node('/').allSubChildren():
-        if is_render_node(node):
+def remove_stale_callbacks(node):
+    """
+    Removes on_render_event callbacks left on `node` by a previous load of
+    this module, which the current CALLBACK_REGISTRY doesn't know about.
+    """
+    for callback in node.renderEventCallbacks():
+        if (getattr(callback, '__module__', None) == __name__
+                and getattr(callback, '__name__', None) == 'on_render_event'):
+            node.removeRenderEventCallback(callback)
+
+def _is_registered(node_path, node):
+    """True if the callback for `node_path` was added to this same node (not a deleted one)."""
+    try:
+        return CALLBACK_REGISTRY[node_path][0].sessionId() == node.sessionId()
+    except (KeyError, AttributeError, hou.ObjectWasDeleted):
+        return False
+
+def sync_callbacks():
+    """
+    Scans the scene once and only adds or removes the callbacks that changed:
+    new render nodes get one, nodes that are gone lose theirs.
+    """
+    desired = {}
+    for node in get_render_nodes():
+        try:
+            desired[node.path()] = node
+        except hou.ObjectWasDeleted:
+            continue
+    for node_path in list(CALLBACK_REGISTRY):
+        if not _is_registered(node_path, desired.get(node_path)):
+            unregister_callback(node_path)
+    for node_path, node in desired.items():
+        if node_path not in CALLBACK_REGISTRY:
             try:
-                node_path = node.path()
-                if node_path not in CALLBACK_REGISTRY:
-                    node.addRenderEventCallback(on_render_event)
-                    CALLBACK_REGISTRY.add(node_path)
+                register_callback(node)
             except Exception as e:
                 ui.log_message(f"Error adding callback to {node_path}: {str(e)}")
     ui.update_callbacks_list()
@@ -663,9 +1114,91 @@ def test_telegram_connection():
     else:
         ui.log_message("Failed to send test message. Check your BOT_TOKEN and CHAT_ID.")
 
+# Pool de Qt para las peticiones lanzadas desde la UI. Un solo hilo para que los
+# envíos salgan en orden (las notificaciones agrupadas no deben adelantarse).
+_UI_THREAD_POOL = QtCore.QThreadPool()
+_UI_THREAD_POOL.setMaxThreadCount(1)
+
+class _TaskSignals(QtCore.QObject):
+    done = QtCore.Signal(object)
+
+class _BackgroundTask(QtCore.QRunnable):
+    def __init__(self, func, args):
+        super(_BackgroundTask, self).__init__()
+        self.func = func
+        self.args = args
+        self.signals = _TaskSignals()
+
+    def run(self):
+        try:
+            result = self.func(*self.args)
+        except Exception:
+            traceback.print_exc()
+            result = None
+        self.signals.done.emit(result)
+
+def run_in_background(func, callback=None, *args):
+    """
+    Runs func(*args) on a QThreadPool worker and delivers the result to
+    `callback` on the GUI thread. `callback` must be a method of a QObject so
+    the signal is queued to its thread; it receives None if `func` raised.
+    """
+    task = _BackgroundTask(func, args)
+    if callback is not None:
+        task.signals.done.connect(callback)
+    _UI_THREAD_POOL.start(task)
+
 # Variable global para almacenar la instancia de la UI
 UI_INSTANCE = None
 
+# Estilos del botón de activación y del indicador, según su propiedad "state"
+_TOGGLE_BUTTON_QSS = (
+    "QPushButton[state='on'] { background-color: green; color: white; }"
+    "QPushButton[state='off'] { background-color: red; color: white; }"
+)
+_STATUS_DOT_QSS = (
+    "QLabel[state='on'] { background-color: green; border-radius: 10px; }"
+    "QLabel[state='off'] { background-color: red; border-radius: 10px; }"
+)
+
+# Texto de ayuda compartido por la ventana principal y los diálogos de configuración
+_HELP_HTML = (
+    "📝 <b>How to Get Telegram BOT_TOKEN and CHAT_ID</b><br><br>"
+    "1. <b>Create a Telegram Bot:</b><br>"
+    "   - Open Telegram and search for the <b>BotFather</b>.<br>"
+    "   - Start a chat with BotFather and use the <b>/newbot</b> command.<br>"
+    "   - Follow the instructions to create a new bot.<br>"
+    "   - At the end, BotFather will give you a <b>BOT_TOKEN</b>.<br><br>"
+    "2. <b>Get Your CHAT_ID:</b><br>"
+    "   <b>Option 1: Using Raw Data Bot</b><br>"
+    "   - Open Telegram and search for the <b>Raw Data Bot</b>.<br>"
+    "   - Start a chat with the bot and send any message.<br>"
+    "   - The bot will reply with your <b>CHAT_ID</b>.<br><br>"
+    "   <b>Option 2: Using getUpdates API</b><br>"
+    "   - Open Telegram and search for the bot you just created.<br>"
+    "   - Start a chat with the bot and send any message.<br>"
+    "   - Go to <b>https://api.telegram.org/bot&lt;YOUR_BOT_TOKEN&gt;/getUpdates</b>.<br>"
+    "   - Look for the <b>chat.id</b> field in the response.<br><br>"
+    "3. <b>Configure the Script:</b><br>"
+    "   - Enter the <b>BOT_TOKEN</b> and <b>CHAT_ID</b> in the configuration dialog.<br>"
+    "   - Separate multiple CHAT_IDs with commas if needed.<br><br>"
+    "🔗 <b>For more details, visit:</b><br>"
+    "<a href='https://core.telegram.org/bots#creating-a-new-bot'>Telegram Bot Documentation</a>"
+)
+
+def _show_help_dialog(parent):
+    """
+    Muestra el diálogo de ayuda, creándolo la primera vez y reutilizándolo en `parent._help_dialog`.
+    """
+    dialog = getattr(parent, "_help_dialog", None)
+    if dialog is None:
+        dialog = QtWidgets.QMessageBox(parent)
+        dialog.setWindowTitle("Help")
+        dialog.setTextFormat(QtCore.Qt.RichText)
+        dialog.setText(_HELP_HTML)
+        parent._help_dialog = dialog
+    dialog.exec_()
+
 def create_ui():
     """
     Crea o muestra la interfaz de usuario.
@@ -696,7 +1229,24 @@ class TelegramNotificationsUI(QtWidgets.QWidget):
         self.setGeometry(100, 100, 600, 400)
         self.setWindowFlags(self.windowFlags() & ~QtCore.Qt.WindowContextHelpButtonHint)
 
+        self._help_dialog = None
+        self._token_dialog = None
+        self._chat_dialog = None
+        self._last_callbacks = set()
+
+        self._flush_timer = QtCore.QTimer(self)
+        self._flush_timer.setInterval(FLUSH_INTERVAL_MS)
+        self._flush_timer.timeout.connect(self._flush_notifications)
+
+        # Los mensajes de log se acumulan y se escriben juntos cada 100 ms;
+        # así también se pueden registrar desde otros hilos
+        self._log_buffer = collections.deque(maxlen=2000)
+        self._log_timer = QtCore.QTimer(self)
+        self._log_timer.setInterval(100)
+        self._log_timer.timeout.connect(self._flush_log)
+
         self.init_ui()
+        self._log_timer.start()
 
     # Aquí va la clase CustomInputDialog (dentro de TelegramNotificationsUI)
     class CustomInputDialog(QtWidgets.QDialog):
@@ -706,6 +1256,7 @@ class TelegramNotificationsUI(QtWidgets.QWidget):
             self.setWindowFlags(self.windowFlags() & ~QtCore.Qt.WindowContextHelpButtonHint)
             self.setWindowTitle(title)
             self.setMinimumWidth(400)
+            self._help_dialog = None
             
             # Layout principal
             layout = QtWidgets.QVBoxLayout(self)
@@ -741,42 +1292,25 @@ class TelegramNotificationsUI(QtWidgets.QWidget):
             layout.addWidget(button_box)
 
         def show_help(self):
-            help_text = (
-                "📝 <b>How to Get Telegram BOT_TOKEN and CHAT_ID</b><br><br>"
-                "1. <b>Create a Telegram Bot:</b><br>"
-                "   - Open Telegram and search for the <b>BotFather</b>.<br>"
-                "   - Start a chat with BotFather and use the <b>/newbot</b> command.<br>"
-                "   - Follow the instructions to create a new bot.<br>"
-                "   - At the end, BotFather will give you a <b>BOT_TOKEN</b>.<br><br>"
-                "2. <b>Get Your CHAT_ID:</b><br>"
-                "   <b>Option 1: Using Raw Data Bot</b><br>"
-                "   - Open Telegram and search for the <b>Raw Data Bot</b>.<br>"
-                "   - Start a chat with the bot and send any message.<br>"
-                "   - The bot will reply with your <b>CHAT_ID</b>.<br><br>"
-                "   <b>Option 2: Using getUpdates API</b><br>"
-                "   - Open Telegram and search for the bot you just created.<br>"
-                "   - Start a chat with the bot and send any message.<br>"
-                "   - Go to <b>https://api.telegram.org/bot&lt;YOUR_BOT_TOKEN&gt;/getUpdates</b>.<br>"
-                "   - Look for the <b>chat.id</b> field in the response.<br><br>"
-                "3. <b>Configure the Script:</b><br>"
-                "   - Enter the <b>BOT_TOKEN</b> and <b>CHAT_ID</b> in the configuration dialog.<br>"
-                "   - Separate multiple CHAT_IDs with commas if needed.<br><br>"
-                "🔗 <b>For more details, visit:</b><br>"
-                "<a href='https://core.telegram.org/bots#creating-a-new-bot'>Telegram Bot Documentation</a>"
-            )
-            help_dialog = QtWidgets.QMessageBox(self)
-            help_dialog.setWindowTitle("Help")
-            help_dialog.setTextFormat(QtCore.Qt.RichText)
-            help_dialog.setText(help_text)
-            help_dialog.exec_()
+            _show_help_dialog(self)
 
         def get_input(self):
             return self.input_field.text()
 
+    def _mkbutton(self, text, slot):
+        """
+        Crea un botón con su texto y lo conecta al slot indicado.
+        """
+        button = QtWidgets.QPushButton(text)
+        button.clicked.connect(slot)
+        return button
+
     def init_ui(self):
         """
         Inicializa la interfaz de usuario.
         """
+        # Un solo cálculo de geometría al final, en lugar de uno por widget añadido
+        self.setUpdatesEnabled(False)
         main_layout = QtWidgets.QHBoxLayout()
         left_layout = QtWidgets.QVBoxLayout()
 
@@ -784,34 +1318,27 @@ class TelegramNotificationsUI(QtWidgets.QWidget):
         buttons_grid = QtWidgets.QGridLayout()
 
         # Botón de configuración (fila 0, columna 0)
-        self.config_button = QtWidgets.QPushButton("Configure Telegram Bot")
-        self.config_button.clicked.connect(self.configure_telegram_bot)
-        self.config_button.setStyleSheet("")
+        self.config_button = self._mkbutton("Configure Telegram Bot", self.configure_telegram_bot)
         buttons_grid.addWidget(self.config_button, 0, 0)
 
         # Botón para crear la Shelf Tool (fila 0, columna 1)
-        self.shelf_tool_button = QtWidgets.QPushButton("Create Shelf Tool")
-        self.shelf_tool_button.clicked.connect(self.create_shelf_tool)  # Conectar el botón al método
-        self.shelf_tool_button.setStyleSheet("")
+        self.shelf_tool_button = self._mkbutton("Create Shelf Tool", self.create_shelf_tool)
         buttons_grid.addWidget(self.shelf_tool_button, 0, 1)
 
         # Botón de Help (fila 0 y 1, columna 2, ocupa 2 filas)
-        self.help_button = QtWidgets.QPushButton("❓")
+        self.help_button = self._mkbutton("❓", self.show_help)
         self.help_button.setFixedSize(50, 50)  # Tamaño cuadrado
-        self.help_button.clicked.connect(self.show_help)
         self.help_button.setStyleSheet("font-size: 20px;")  # Tamaño del emoji
         buttons_grid.addWidget(self.help_button, 0, 2, 2, 1)  # Ocupa 2 filas y 1 columna
 
         # Botón de prueba de conexión (fila 1, columna 0)
-        self.test_button = QtWidgets.QPushButton("Test Telegram Connection")
-        self.test_button.clicked.connect(self.test_telegram_connection)
-        self.test_button.setStyleSheet("")
+        self.test_button = self._mkbutton("Test Telegram Connection", self.test_telegram_connection)
         buttons_grid.addWidget(self.test_button, 1, 0)
 
         # Botón para habilitar/deshabilitar notificaciones (fila 1, columna 1)
-        self.toggle_button = QtWidgets.QPushButton("Enable Notifications")
-        self.toggle_button.clicked.connect(self.toggle_notifications)
-        self.toggle_button.setStyleSheet("background-color: red; color: white;")
+        self.toggle_button = self._mkbutton("Enable Notifications", self.toggle_notifications)
+        self.toggle_button.setStyleSheet(_TOGGLE_BUTTON_QSS)
+        self.toggle_button.setProperty("state", "off")
         buttons_grid.addWidget(self.toggle_button, 1, 1)
 
         # Añadir el layout de cuadrícula al layout principal
@@ -823,7 +1350,8 @@ class TelegramNotificationsUI(QtWidgets.QWidget):
         status_layout.addWidget(self.status_label)
         self.status_indicator = QtWidgets.QLabel()
         self.status_indicator.setFixedSize(20, 20)
-        self.status_indicator.setStyleSheet("background-color: red; border-radius: 10px;")
+        self.status_indicator.setStyleSheet(_STATUS_DOT_QSS)
+        self.status_indicator.setProperty("state", "off")
         status_layout.addWidget(self.status_indicator)
         left_layout.addLayout(status_layout)
 
@@ -832,7 +1360,8 @@ class TelegramNotificationsUI(QtWidgets.QWidget):
         left_layout.addWidget(self.config_path_label)
 
         # Área de registro
-        self.log_area = QtWidgets.QTextEdit()
+        self.log_area = QtWidgets.QPlainTextEdit()
+        self.log_area.setMaximumBlockCount(2000)  # Descarta las líneas más antiguas
         self.log_area.setReadOnly(True)
         self.log_area.setPlaceholderText("Log messages will appear here...")
         left_layout.addWidget(self.log_area)
@@ -849,8 +1378,16 @@ class TelegramNotificationsUI(QtWidgets.QWidget):
         main_layout.addLayout(right_layout)
 
         self.setLayout(main_layout)
+        self.setUpdatesEnabled(True)
 
     def create_shelf_tool(self):
+        """
+        Programa la creación de la herramienta para el siguiente ciclo del event loop,
+        así el diálogo modal no se anida dentro del slot del clic.
+        """
+        QtCore.QTimer.singleShot(0, self._do_create_shelf_tool)
+
+    def _do_create_shelf_tool(self):
         """
         Crea una herramienta en un estante para las notificaciones de Telegram.
         """
@@ -901,40 +1438,72 @@ telegram_notifications.create_ui()
         """
         Añade un mensaje al área de registro.
         """
-        self.log_area.append(message)
+        self._log_buffer.append(message)
+
+    def _flush_log(self):
+        """
+        Escribe de una vez los mensajes pendientes en el área de registro.
+        """
+        if not self._log_buffer:
+            return
+        batch = []
+        while self._log_buffer:
+            batch.append(self._log_buffer.popleft())
+        self.log_area.appendPlainText("\n".join(batch))
+        scroll_bar = self.log_area.verticalScrollBar()
+        scroll_bar.setValue(scroll_bar.maximum())
 
     def configure_telegram_bot(self):
+        """
+        Programa la configuración para el siguiente ciclo del event loop,
+        así los diálogos modales no se anidan dentro del slot del clic.
+        """
+        QtCore.QTimer.singleShot(0, self._do_configure_telegram_bot)
+
+    def _do_configure_telegram_bot(self):
         """
         Configura el bot de Telegram usando diálogos personalizados con botón de ayuda.
         """
-        # Diálogo para BOT_TOKEN
-        token_dialog = self.CustomInputDialog(
-            "Configure Bot",
-            "Enter your Telegram BOT_TOKEN:",
-            self
-        )
+        # Diálogo para BOT_TOKEN (se crea la primera vez y luego se reutiliza)
+        if self._token_dialog is None:
+            self._token_dialog = self.CustomInputDialog(
+                "Configure Bot",
+                "Enter your Telegram BOT_TOKEN:",
+                self
+            )
+        self._token_dialog.input_field.clear()
         
-        if token_dialog.exec_() == QtWidgets.QDialog.Accepted:
-            bot_token = token_dialog.get_input()
+        if self._token_dialog.exec_() == QtWidgets.QDialog.Accepted:
+            bot_token = self._token_dialog.get_input().strip()
+            if bot_token and not _TOKEN_RE.match(bot_token):
+                self.log_message("Invalid BOT_TOKEN format (expected <bot id>:<35-character key>)")
+                return
             if bot_token:
                 # Diálogo para CHAT_ID
-                chat_dialog = self.CustomInputDialog(
-                    "Configure Bot",
-                    "Enter your Telegram CHAT_ID:\n(Separate multiple IDs with commas)",
-                    self
-                )
+                if self._chat_dialog is None:
+                    self._chat_dialog = self.CustomInputDialog(
+                        "Configure Bot",
+                        "Enter your Telegram CHAT_ID:\n(Separate multiple IDs with commas)",
+                        self
+                    )
+                self._chat_dialog.input_field.clear()
                 
-                if chat_dialog.exec_() == QtWidgets.QDialog.Accepted:
-                    chat_id = chat_dialog.get_input()
+                if self._chat_dialog.exec_() == QtWidgets.QDialog.Accepted:
+                    chat_id = self._chat_dialog.get_input()
                     if chat_id:
+                        chat_ids = parse_chat_ids(chat_id)
+                        invalid_ids = [cid for cid in chat_ids if not _CHAT_ID_RE.match(cid)]
+                        if invalid_ids:
+                            self.log_message(f"Invalid CHAT_ID format: {', '.join(invalid_ids)}")
+                            return
                         config = {
                             "BOT_TOKEN": bot_token,
-                            "CHAT_IDS": [cid.strip() for cid in chat_id.split(",")]
+                            "CHAT_IDS": chat_ids
                         }
-                        with open(CONFIG_FILE, "w") as f:
-                            json.dump(config, f)
-                        self.log_message(f"Config saved to: {CONFIG_FILE}")
-                        self.config_path_label.setText(f"Config: {CONFIG_FILE}")
+                        if save_config(config):
+                            self.log_message(f"Config saved to: {CONFIG_FILE}")
+                        else:
+                            self.log_message("Configuration unchanged, nothing to save")
                         
                         # Mostrar mensaje de éxito
                         success_msg = QtWidgets.QMessageBox(self)
@@ -947,8 +1516,26 @@ telegram_notifications.create_ui()
         """
         Prueba la conexión con Telegram.
         """
+        try:
+            bot_token = get_bot_token()
+        except (OSError, ValueError, KeyError):
+            self.log_message("No valid configuration found. Use 'Configure Telegram Bot' to set it up.")
+            return
+        # Comprobar el formato del token antes de hacer ninguna petición
+        if not _TOKEN_RE.match(str(bot_token)):
+            self.log_message("Invalid BOT_TOKEN format. Use 'Configure Telegram Bot' to set it again.")
+            return
         message = "🔄 Test message from Houdini - If you see this, the notification system is working!"
-        if send_telegram_message(message):
+        self.test_button.setEnabled(False)
+        self.log_message("Sending test message...")
+        run_in_background(send_telegram_message, self.on_test_message_sent, message)
+
+    def on_test_message_sent(self, message_ids):
+        """
+        Recibe el resultado del mensaje de prueba en el hilo de la UI.
+        """
+        self.test_button.setEnabled(True)
+        if message_ids:
             self.log_message("Test message sent successfully! Check your Telegram.")
         else:
             self.log_message("Failed to send test message. Check your BOT_TOKEN and CHAT_ID.")
@@ -961,65 +1548,62 @@ telegram_notifications.create_ui()
         NOTIFICATIONS_ENABLED = not NOTIFICATIONS_ENABLED
         if NOTIFICATIONS_ENABLED:
             self.toggle_button.setText("Disable Notifications")
-            self.toggle_button.setStyleSheet("background-color: green; color: white;")
             self.status_label.setText("Notifications: Enabled")
-            self.status_indicator.setStyleSheet("background-color: green; border-radius: 10px;")
-            setup_render_callbacks()
+            sync_callbacks()
+            self._flush_timer.start()
         else:
             self.toggle_button.setText("Enable Notifications")
-            self.toggle_button.setStyleSheet("background-color: red; color: white;")
             self.status_label.setText("Notifications: Disabled")
-            self.status_indicator.setStyleSheet("background-color: red; border-radius: 10px;")
             remove_all_callbacks()
+            self._flush_timer.stop()
+            self._flush_notifications()
+        # El color lo da la hoja de estilos según la propiedad "state"
+        state = "on" if NOTIFICATIONS_ENABLED else "off"
+        for widget in (self.toggle_button, self.status_indicator):
+            widget.setProperty("state", state)
+            widget.style().unpolish(widget)
+            widget.style().polish(widget)
         self.update_callbacks_list()
 
+    def _flush_notifications(self):
+        """
+        Envía en segundo plano las notificaciones acumuladas.
+        """
+        if NOTIF_BUFFER:
+            run_in_background(flush_notifications)
+
     def update_callbacks_list(self):
         """
         Actualiza la lista de callbacks en la UI.
         """
-        callbacks = list(CALLBACK_REGISTRY)
-        self.callbacks_list.clear()
-        self.callbacks_list.addItems(callbacks)
+        # Solo se tocan las entradas que han cambiado desde la última vez
+        callbacks = set(CALLBACK_REGISTRY)
+        if callbacks == self._last_callbacks:
+            return
+        blocker = QtCore.QSignalBlocker(self.callbacks_list)
+        self.callbacks_list.setUpdatesEnabled(False)
+        try:
+            for node_path in self._last_callbacks - callbacks:
+                for item in self.callbacks_list.findItems(node_path, QtCore.Qt.MatchExactly):
+                    self.callbacks_list.takeItem(self.callbacks_list.row(item))
+            for node_path in sorted(callbacks - self._last_callbacks):
+                self.callbacks_list.addItem(node_path)
+        finally:
+            self.callbacks_list.setUpdatesEnabled(True)
+            blocker.unblock()
+        self._last_callbacks = callbacks
 
     def show_help(self):
         """
         Muestra un diálogo de ayuda.
         """
-        help_text = (
-            "📝 <b>How to Get Telegram BOT_TOKEN and CHAT_ID</b><br><br>"
-            "1. <b>Create a Telegram Bot:</b><br>"
-            "   - Open Telegram and search for the <b>BotFather</b>.<br>"
-            "   - Start a chat with BotFather and use the <b>/newbot</b> command.<br>"
-            "   - Follow the instructions to create a new bot.<br>"
-            "   - At the end, BotFather will give you a <b>BOT_TOKEN</b>.<br><br>"
-            "2. <b>Get Your CHAT_ID:</b><br>"
-            "   <b>Option 1: Using Raw Data Bot</b><br>"
-            "   - Open Telegram and search for the <b>Raw Data Bot</b>.<br>"
-            "   - Start a chat with the bot and send any message.<br>"
-            "   - The bot will reply with your <b>CHAT_ID</b>.<br><br>"
-            "   <b>Option 2: Using getUpdates API</b><br>"
-            "   - Open Telegram and search for the bot you just created.<br>"
-            "   - Start a chat with the bot and send any message.<br>"
-            "   - Go to <b>https://api.telegram.org/bot&lt;YOUR_BOT_TOKEN&gt;/getUpdates</b>.<br>"
-            "   - Look for the <b>chat.id</b> field in the response.<br><br>"
-            "3. <b>Configure the Script:</b><br>"
-            "   - Enter the <b>BOT_TOKEN</b> and <b>CHAT_ID</b> in the configuration dialog.<br>"
-            "   - Separate multiple CHAT_IDs with commas if needed.<br><br>"
-            "🔗 <b>For more details, visit:</b><br>"
-            "<a href='https://core.telegram.org/bots#creating-a-new-bot'>Telegram Bot Documentation</a>"
-        )
-        help_dialog = QtWidgets.QMessageBox(self)
-        help_dialog.setWindowTitle("Help")
-        help_dialog.setTextFormat(QtCore.Qt.RichText)
-        help_dialog.setText(help_text)
-        help_dialog.exec_()
+        _show_help_dialog(self)
 
 # Inicialización de la UI
 ui = create_ui()
+load_config(prompt=True)
 ui.log_message("\nSetting up render notifications...")
-clear_duplicates()
-remove_all_callbacks()
-setup_render_callbacks()
+sync_callbacks()
 ui.log_message("\nTelegram render notifications are now active!")
 ui.log_message("\nNote: Run this script again if you create new render nodes!")
 ui.update_callbacks_list()